@@ -2,11 +2,13 @@
 """ A climate over switch classe """
 import logging
 from datetime import timedelta, datetime
+from typing import Any
 
 from homeassistant.helpers.event import (
-    async_track_state_change_event,
+    async_track_state_change_filtered,
     async_track_time_interval,
     EventStateChangedData,
+    TrackStates,
 )
 from homeassistant.core import Event, HomeAssistant, callback
 from homeassistant.components.climate import HVACMode
@@ -26,26 +28,51 @@ from .underlyings import UnderlyingValve
 
 _LOGGER = logging.getLogger(__name__)
 
+# The custom attributes which change at each update without any observable change
+VOLATILE_ATTRIBUTES = frozenset({"last_update_datetime", "last_calculation_timestamp"})
+
+
+def _decide_valve_percent(
+    on_percent: float, current_percent: int, dpercent_threshold: float
+) -> int | None:
+    """Calculate the new valve open percent from the on_percent of the algorithm.
+    Returns None if the change is under the regulation threshold"""
+    if on_percent <= 0:
+        new_valve_percent = 0
+    elif on_percent >= 1:
+        new_valve_percent = 100
+    else:
+        new_valve_percent = round(on_percent * 100)
+
+    # Issue 533 - don't filter with dtemp if valve should be close. Else it will never close
+    if new_valve_percent < dpercent_threshold:
+        new_valve_percent = 0
+
+    dpercent = new_valve_percent - current_percent
+    if new_valve_percent > 0 and -1 * dpercent_threshold <= dpercent < dpercent_threshold:
+        return None
+
+    return new_valve_percent
+
+
 class ThermostatOverValve(BaseThermostat[UnderlyingValve]):  # pylint: disable=abstract-method
     """Representation of a class for a Versatile Thermostat over a Valve"""
 
-    _entity_component_unrecorded_attributes = BaseThermostat._entity_component_unrecorded_attributes.union(  # pylint: disable=protected-access
-        frozenset(
-            {
-                "is_over_valve",
-                "underlying_entities",
-                "on_time_sec",
-                "off_time_sec",
-                "cycle_min",
-                "function",
-                "tpi_coef_int",
-                "tpi_coef_ext",
-                "auto_regulation_dpercent",
-                "auto_regulation_period_min",
-                "last_calculation_timestamp",
-                "calculated_on_percent",
-            }
-        )
+    _entity_component_unrecorded_attributes = BaseThermostat._entity_component_unrecorded_attributes | frozenset(  # pylint: disable=protected-access
+        {
+            "is_over_valve",
+            "underlying_entities",
+            "on_time_sec",
+            "off_time_sec",
+            "cycle_min",
+            "function",
+            "tpi_coef_int",
+            "tpi_coef_ext",
+            "auto_regulation_dpercent",
+            "auto_regulation_period_min",
+            "last_calculation_timestamp",
+            "calculated_on_percent",
+        }
     )
 
     def __init__(
@@ -54,8 +81,15 @@ class ThermostatOverValve(BaseThermostat[UnderlyingValve]):  # pylint: disable=a
         """Initialize the thermostat over switch."""
         self._valve_open_percent: int = 0
         self._last_calculation_timestamp: datetime | None = None
+        # The last calculation timestamp and its iso format in the current timezone
+        self._last_calc_iso_cache: tuple[datetime | None, str | None] = (None, None)
         self._auto_regulation_dpercent: float | None = None
         self._auto_regulation_period_min: int | None = None
+        self._auto_regulation_period_td: timedelta = timedelta(0)
+        # The custom attributes which never change after post_init
+        self._static_attrs: dict[str, Any] = {}
+        # What was written by the last update_custom_attributes
+        self._last_written_signature: tuple | None = None
 
         # Call to super must be done after initialization because it calls post_init at the end
         super().__init__(hass, unique_id, name, config_entry)
@@ -73,21 +107,34 @@ class ThermostatOverValve(BaseThermostat[UnderlyingValve]):  # pylint: disable=a
         else:
             return self._valve_open_percent
 
+    @property
+    def last_calculation_timestamp_iso(self) -> str | None:
+        """The last calculation timestamp in iso format in the current timezone"""
+        if self._last_calculation_timestamp is not self._last_calc_iso_cache[0]:
+            self._last_calc_iso_cache = (
+                self._last_calculation_timestamp,
+                (
+                    self._last_calculation_timestamp.astimezone(
+                        self._current_tz
+                    ).isoformat()
+                    if self._last_calculation_timestamp
+                    else None
+                ),
+            )
+        return self._last_calc_iso_cache[1]
+
     @overrides
     def post_init(self, config_entry: ConfigData):
         """Initialize the Thermostat"""
 
         super().post_init(config_entry)
 
-        self._auto_regulation_dpercent = (
-            config_entry.get(CONF_AUTO_REGULATION_DTEMP)
-            if config_entry.get(CONF_AUTO_REGULATION_DTEMP) is not None
-            else 0.0
-        )
-        self._auto_regulation_period_min = (
-            config_entry.get(CONF_AUTO_REGULATION_PERIOD_MIN)
-            if config_entry.get(CONF_AUTO_REGULATION_PERIOD_MIN) is not None
-            else 0
+        dpercent = config_entry.get(CONF_AUTO_REGULATION_DTEMP)
+        self._auto_regulation_dpercent = 0.0 if dpercent is None else dpercent
+        period_min = config_entry.get(CONF_AUTO_REGULATION_PERIOD_MIN)
+        self._auto_regulation_period_min = 0 if period_min is None else period_min
+        self._auto_regulation_period_td = timedelta(
+            minutes=self._auto_regulation_period_min
         )
 
         self._prop_algorithm = PropAlgorithm(
@@ -103,13 +150,26 @@ class ThermostatOverValve(BaseThermostat[UnderlyingValve]):  # pylint: disable=a
 
         lst_valves = config_entry.get(CONF_UNDERLYING_LIST)
 
-        for _, valve in enumerate(lst_valves):
-            self._underlyings.append(
-                UnderlyingValve(hass=self._hass, thermostat=self, valve_entity_id=valve)
-            )
+        self._underlyings.extend(
+            UnderlyingValve(hass=self._hass, thermostat=self, valve_entity_id=valve)
+            for valve in lst_valves
+        )
 
         self._should_relaunch_control_heating = False
 
+        self._static_attrs = {
+            "is_over_valve": self.is_over_valve,
+            "underlying_entities": [
+                underlying.entity_id for underlying in self._underlyings
+            ],
+            "cycle_min": self._cycle_min,
+            "function": self._proportional_function,
+            "tpi_coef_int": self._tpi_coef_int,
+            "tpi_coef_ext": self._tpi_coef_ext,
+            "auto_regulation_dpercent": self._auto_regulation_dpercent,
+            "auto_regulation_period_min": self._auto_regulation_period_min,
+        }
+
     @overrides
     async def async_added_to_hass(self):
         """Run when entity about to be added."""
@@ -117,13 +177,19 @@ class ThermostatOverValve(BaseThermostat[UnderlyingValve]):  # pylint: disable=a
 
         await super().async_added_to_hass()
 
-        # Add listener to all underlying entities
-        for valve in self._underlyings:
-            self.async_on_remove(
-                async_track_state_change_event(
-                    self.hass, [valve.entity_id], self._async_valve_changed
-                )
+        # Add one filtered listener for all underlying entities. The listener only
+        # logs the changes so it is useless if debug is not enabled
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            valves_tracker = async_track_state_change_filtered(
+                self.hass,
+                TrackStates(
+                    all_states=False,
+                    entities={valve.entity_id for valve in self._underlyings},
+                    domains=set(),
+                ),
+                self._async_valve_changed,
             )
+            self.async_on_remove(valves_tracker.async_remove)
 
         # Start the control_heating
         # starts a cycle
@@ -149,49 +215,50 @@ class ThermostatOverValve(BaseThermostat[UnderlyingValve]):  # pylint: disable=a
     def update_custom_attributes(self):
         """Custom attributes"""
         super().update_custom_attributes()
-        self._attr_extra_state_attributes[
-            "valve_open_percent"
-        ] = self.valve_open_percent
-        self._attr_extra_state_attributes["is_over_valve"] = self.is_over_valve
-
-        self._attr_extra_state_attributes["underlying_entities"] = [
-           underlying.entity_id for underlying in self._underlyings
-        ]
-
-        self._attr_extra_state_attributes[
-            "on_percent"
-        ] = self._prop_algorithm.on_percent
-        self._attr_extra_state_attributes[
-            "on_time_sec"
-        ] = self._prop_algorithm.on_time_sec
-        self._attr_extra_state_attributes[
-            "off_time_sec"
-        ] = self._prop_algorithm.off_time_sec
-        self._attr_extra_state_attributes["cycle_min"] = self._cycle_min
-        self._attr_extra_state_attributes["function"] = self._proportional_function
-        self._attr_extra_state_attributes["tpi_coef_int"] = self._tpi_coef_int
-        self._attr_extra_state_attributes["tpi_coef_ext"] = self._tpi_coef_ext
-        self._attr_extra_state_attributes[
-            "auto_regulation_dpercent"
-        ] = self._auto_regulation_dpercent
-        self._attr_extra_state_attributes[
-            "auto_regulation_period_min"
-        ] = self._auto_regulation_period_min
-        self._attr_extra_state_attributes["last_calculation_timestamp"] = (
-            self._last_calculation_timestamp.astimezone(self._current_tz).isoformat()
-            if self._last_calculation_timestamp
-            else None
+        self._attr_extra_state_attributes.update(self._static_attrs)
+        self._attr_extra_state_attributes.update(
+            {
+                "valve_open_percent": self.valve_open_percent,
+                "on_percent": self._prop_algorithm.on_percent,
+                "on_time_sec": self._prop_algorithm.on_time_sec,
+                "off_time_sec": self._prop_algorithm.off_time_sec,
+                "last_calculation_timestamp": self.last_calculation_timestamp_iso,
+                "calculated_on_percent": self._prop_algorithm.calculated_on_percent,
+            }
         )
-        self._attr_extra_state_attributes[
-            "calculated_on_percent"
-        ] = self._prop_algorithm.calculated_on_percent
 
-        self.async_write_ha_state()
-        _LOGGER.debug(
-            "%s - Calling update_custom_attributes: %s",
-            self,
-            self._attr_extra_state_attributes,
+        # Don't write the state if nothing observable has changed since the last write
+        signature = (
+            self._target_temp,
+            self._cur_temp,
+            {
+                key: value
+                for key, value in self._attr_extra_state_attributes.items()
+                if key not in VOLATILE_ATTRIBUTES
+            },
         )
+        if signature == self._last_written_signature:
+            _LOGGER.debug(
+                "%s - no observable change in custom attributes. State is not written",
+                self,
+            )
+            return
+
+        self.async_write_ha_state()
+        self._last_written_signature = signature
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug(
+                "%s - Calling update_custom_attributes: %s",
+                self,
+                self._attr_extra_state_attributes,
+            )
+
+    @overrides
+    def async_write_ha_state(self):
+        """Forget the last written signature because the state could have been written
+        from anywhere"""
+        self._last_written_signature = None
+        return super().async_write_ha_state()
 
     @overrides
     def recalculate(self):
@@ -204,12 +271,12 @@ class ThermostatOverValve(BaseThermostat[UnderlyingValve]):  # pylint: disable=a
         now = self.now
 
         if self._last_calculation_timestamp is not None:
-            period = (now - self._last_calculation_timestamp).total_seconds() / 60
-            if period < self._auto_regulation_period_min:
+            period = now - self._last_calculation_timestamp
+            if period < self._auto_regulation_period_td:
                 _LOGGER.info(
                     "%s - do not calculate TPI because regulation_period (%d) is not exceeded",
                     self,
-                    period,
+                    period.total_seconds() / 60,
                 )
                 return
 
@@ -220,27 +287,17 @@ class ThermostatOverValve(BaseThermostat[UnderlyingValve]):  # pylint: disable=a
             self._hvac_mode or HVACMode.OFF,
         )
 
-        new_valve_percent = round(
-            max(0, min(self.proportional_algorithm.on_percent, 1)) * 100
+        new_valve_percent = _decide_valve_percent(
+            self.proportional_algorithm.on_percent,
+            self._valve_open_percent,
+            self._auto_regulation_dpercent,
         )
-
-        # Issue 533 - don't filter with dtemp if valve should be close. Else it will never close
-        if new_valve_percent < self._auto_regulation_dpercent:
-            new_valve_percent = 0
-
-        dpercent = new_valve_percent - self.valve_open_percent
-        if (
-            new_valve_percent > 0
-            and -1 * self._auto_regulation_dpercent
-            <= dpercent
-            < self._auto_regulation_dpercent
-        ):
+        if new_valve_percent is None:
             _LOGGER.debug(
                 "%s - do not calculate TPI because regulation_dpercent (%.1f) is not exceeded",
                 self,
-                dpercent,
+                self._auto_regulation_dpercent,
             )
-
             return
 
         if self._valve_open_percent == new_valve_percent:
@@ -271,6 +328,9 @@ class ThermostatOverValve(BaseThermostat[UnderlyingValve]):  # pylint: disable=a
                 self.power_manager.mean_cycle_power * float(self._cycle_min) / 60.0
             )
 
+        # The total energy is None until the first increment
+        energy_changed = added_energy > 0 or self._total_energy is None
+
         if self._total_energy is None:
             self._total_energy = added_energy
             _LOGGER.debug(
@@ -286,11 +346,14 @@ class ThermostatOverValve(BaseThermostat[UnderlyingValve]):  # pylint: disable=a
                 self._total_energy,
             )
 
-        self.update_custom_attributes()
+        # Don't write the state if the energy has not changed
+        if energy_changed:
+            self.update_custom_attributes()
 
-        _LOGGER.debug(
-            "%s - added energy is %.3f . Total energy is now: %.3f",
-            self,
-            added_energy,
-            self._total_energy,
-        )
+        if _LOGGER.isEnabledFor(logging.DEBUG):
+            _LOGGER.debug(
+                "%s - added energy is %.3f . Total energy is now: %.3f",
+                self,
+                added_energy,
+                self._total_energy,
+            )
@@ -9,7 +9,10 @@ from homeassistant.components.climate import HVACAction, HVACMode
 
 from pytest_homeassistant_custom_component.common import MockConfigEntry
 
-from custom_components.versatile_thermostat.thermostat_valve import ThermostatOverValve
+from custom_components.versatile_thermostat.thermostat_valve import (
+    ThermostatOverValve,
+    _decide_valve_percent,
+)
 
 from .commons import *  # pylint: disable=wildcard-import, unused-wildcard-import
 
@@ -716,3 +719,29 @@ async def test_bug_533(
                 ),
             ]
         )
+
+
+@pytest.mark.parametrize(
+    "on_percent, current_percent, dpercent_threshold, expected",
+    [
+        # fmt: off
+        (0.9,   0,  5,  90),
+        (1.2,   0,  5,  100),
+        (-0.1,  50, 5,  0),
+        (0.92,  90, 5,  None),
+        (0.86,  90, 5,  None),
+        (0.84,  90, 5,  84),
+        # Issue 533 - the valve should close even under the threshold
+        (0.03,  5,  5,  0),
+        (0.5,   50, 0,  50),
+        # fmt: on
+    ],
+)
+def test_decide_valve_percent(
+    on_percent, current_percent, dpercent_threshold, expected
+):
+    """Test the calculation of the new valve open percent"""
+    assert (
+        _decide_valve_percent(on_percent, current_percent, dpercent_threshold)
+        == expected
+    )